@@ -1,12 +1,73 @@
 #!/usr/bin/env python3
 import requests
-import json
 import argparse
+import itertools
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List
+import msgspec
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+# Shared session so every request reuses the same keep-alive connections
+SESSION = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504]),
+)
+SESSION.mount("http://", _adapter)
+SESSION.mount("https://", _adapter)
 
-def fetch_proxy_data(country="PL", limit=500, page=1, sort_by="lastChecked", sort_type="desc"):
-    """Fetch proxy data from the direct API endpoint."""
+# Optional output fields in display order: (flag, API key, default, formatter)
+PROXY_FIELDS = (
+    ("type", "protocols", ("unknown",), "/".join),
+    ("lat", "latency", 0, str),
+    ("country", "country", "Unknown", str),
+    ("ccode", "country", "Unknown", str),
+    ("uptime", "upTime", 0, str),
+    ("isp", "isp", "Unknown", str),
+    ("response", "responseTime", 0, str),
+    ("updated", "updated_at", "Unknown", str),
+)
+
+
+def select_fields(include_all=False, include_type=False, include_lat=False,
+                  include_country=False, include_ccode=False, include_uptime=False,
+                  include_isp=False, include_response_time=False, include_updated=False):
+    """Return the (key, default, formatter) entries of PROXY_FIELDS enabled by the given flags."""
+    enabled = {
+        "type": include_type,
+        "lat": include_lat,
+        "country": include_country,
+        "ccode": include_ccode,
+        "uptime": include_uptime,
+        "isp": include_isp,
+        "response": include_response_time,
+        "updated": include_updated,
+    }
+    return [(key, default, fmt) for flag, key, default, fmt in PROXY_FIELDS
+            if include_all or enabled[flag]]
+
+
+def make_proxy_type(fields):
+    """
+    Build a msgspec Struct declaring IP, port and only the given fields.
+    Keys not declared on the struct are skipped while decoding; declared ones are
+    typed Any so values come through exactly as the API sent them.
+    """
+    extra = {key: default for key, default, _ in fields}
+    return msgspec.defstruct(
+        "Proxy",
+        [("ip", Any), ("port", Any)] + [(key, Any, default) for key, default in extra.items()],
+    )
+
+
+def fetch_proxy_data(country="PL", limit=500, page=1, sort_by="lastChecked", sort_type="desc", proxy_type=None):
+    """Fetch proxy data from the direct API endpoint, decoded into proxy_type structs."""
+    if proxy_type is None:
+        proxy_type = make_proxy_type(select_fields(include_all=True))
+    
     url = f"https://proxyfreeonly.com/api/free-proxy-list?limit={limit}&page={page}&country={country}&sortBy={sort_by}&sortType={sort_type}"
     
     # Set up headers
@@ -18,65 +79,58 @@ def fetch_proxy_data(country="PL", limit=500, page=1, sort_by="lastChecked", sor
     }
     
     try:
-        response = requests.get(url, headers=headers)
+        response = SESSION.get(url, headers=headers, timeout=10)
         response.raise_for_status()
-        return response.json()
+        return msgspec.json.decode(response.content, type=List[proxy_type])
     except requests.exceptions.RequestException as e:
         print(f"Error fetching data: {e}", file=sys.stderr)
         sys.exit(1)
+    except msgspec.DecodeError as e:
+        # Also covers msgspec.ValidationError, and non-JSON bodies such as HTML challenge pages
+        print(f"Error fetching data: {e}", file=sys.stderr)
+        sys.exit(1)
 
 
-def format_proxy_info(proxy_list, include_all=False, include_type=False, include_lat=False, 
-                      include_country=False, include_ccode=False, include_uptime=False,
-                      include_isp=False, include_response_time=False, include_updated=False):
-    """Format the proxy information based on included fields."""
-    result = []
+def fetch_proxy_pages(pages=1, first_page=1, max_workers=8, **kwargs):
+    """
+    Fetch consecutive pages concurrently over the shared session.
+    Extra keyword arguments are passed to fetch_proxy_data; results are merged in page order.
+    """
+    def _fetch_page(page):
+        return fetch_proxy_data(page=page, **kwargs)
+    
+    with ThreadPoolExecutor(max_workers=min(max_workers, pages)) as executor:
+        results = list(executor.map(_fetch_page, range(first_page, first_page + pages)))
     
-    for proxy in proxy_list:
-        # Default output is always IP:PORT
-        output = f"{proxy['ip']}:{proxy['port']}"
-        
-        additional_info = []
-        
-        if include_all or include_type:
-            protocols = "/".join(proxy.get("protocols", ["unknown"]))
-            additional_info.append(f"{protocols}")
-            
-        if include_all or include_lat:
-            # Get latency as a number
-            latency = proxy.get("latency", 0)
-            additional_info.append(f"{latency}")
-            
-        if include_all or include_country:
-            country = proxy.get("country", "Unknown")
-            additional_info.append(f"{country}")
-            
-        if include_all or include_ccode:
-            country_code = proxy.get("country", "Unknown")
-            additional_info.append(f"{country_code}")
-            
-        if include_all or include_uptime:
-            uptime = proxy.get("upTime", 0)
-            additional_info.append(f"{uptime}")
-            
-        if include_all or include_isp:
-            isp = proxy.get("isp", "Unknown")
-            additional_info.append(f"{isp}")
-            
-        if include_all or include_response_time:
-            response_time = proxy.get("responseTime", 0)
-            additional_info.append(f"{response_time}")
-            
-        if include_all or include_updated:
-            updated = proxy.get("updated_at", "Unknown")
-            additional_info.append(f"{updated}")
-        
-        if additional_info:
-            output += " " + " ".join(map(str, additional_info))
-        
-        result.append(output)
+    return list(itertools.chain.from_iterable(results))
+
+
+def compile_formatter(fields):
+    """
+    Generate a function that formats one proxy with the given fields in a single f-string.
+    The field selection is fixed for the whole list, so no per-proxy flag checks remain.
+    """
+    # Default output is always IP:PORT
+    template = ["{proxy.ip}:{proxy.port}"]
+    namespace = {}
+    for i, (key, _, fmt) in enumerate(fields):
+        # Keys come from PROXY_FIELDS, never from user input
+        if not key.isidentifier():
+            raise ValueError(f"Invalid proxy field name: {key!r}")
+        if fmt is str:
+            template.append(f"{{proxy.{key}}}")
+        else:
+            namespace[f"fmt{i}"] = fmt
+            template.append(f"{{fmt{i}(proxy.{key})}}")
     
-    return result
+    source = "lambda proxy: f'" + " ".join(template) + "'"
+    return eval(source, namespace)
+
+
+def format_proxy_info(proxy_list, fields):
+    """Format the proxy information based on the fields returned by select_fields."""
+    formatter = compile_formatter(fields)
+    return [formatter(proxy) for proxy in proxy_list]
 
 
 def main():
@@ -96,6 +150,8 @@ def main():
                         help="Limit number of results (default: 500)")
     parser.add_argument("-p", "--page", dest="page", type=int, default=1, 
                         help="Page number (default: 1)")
+    parser.add_argument("-n", "--pages", dest="pages", type=int, default=1,
+                        help="Number of pages to fetch, starting at --page (default: 1)")
     parser.add_argument("-s", "--sort", dest="sort_by", default="lastChecked", 
                         help="Sort by field (default: lastChecked)")
     parser.add_argument("-d", "--direction", dest="sort_type", default="desc", 
@@ -103,18 +159,8 @@ def main():
     
     args = parser.parse_args()
     
-    # Fetch data
-    proxy_list = fetch_proxy_data(
-        country=args.country_filter,
-        limit=args.limit,
-        page=args.page,
-        sort_by=args.sort_by,
-        sort_type=args.sort_type
-    )
-    
-    # Format and print proxy information
-    proxy_info = format_proxy_info(
-        proxy_list,
+    # Work out which fields to output, so only those are decoded
+    fields = select_fields(
         include_all=args.all,
         include_type=args.type,
         include_lat=args.lat,
@@ -126,6 +172,20 @@ def main():
         include_updated=args.updated
     )
     
+    # Fetch data
+    proxy_list = fetch_proxy_pages(
+        pages=max(1, args.pages),
+        first_page=args.page,
+        country=args.country_filter,
+        limit=args.limit,
+        sort_by=args.sort_by,
+        sort_type=args.sort_type,
+        proxy_type=make_proxy_type(fields)
+    )
+    
+    # Format and print proxy information
+    proxy_info = format_proxy_info(proxy_list, fields)
+    
     for proxy in proxy_info:
         print(proxy)
 
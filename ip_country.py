@@ -1,11 +1,35 @@
 #!/usr/bin/env python3
 import argparse
+import asyncio
 import json
-import re
+import shelve
 import sys
 import time
-from typing import List, Dict, Any, Tuple
-import requests
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+import aiohttp
+from aiolimiter import AsyncLimiter
+
+try:
+    import orjson
+    json_loads = orjson.loads
+
+    def json_dumps(obj: Any, indent: bool = False) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+except ImportError:
+    json_loads = json.loads
+
+    def json_dumps(obj: Any, indent: bool = False) -> bytes:
+        return json.dumps(obj, indent=2 if indent else None).encode()
+
+MAX_CONCURRENT_REQUESTS = 8
+# ip-api.com allows 15 batch requests per minute from a single IP
+RATE_LIMIT = 15
+RATE_PERIOD = 60  # seconds
+TIMEOUT = 15  # seconds
+
+# Lookups are cached on disk by IP so repeat runs skip the API
+CACHE_FILE = "ipcache.db"
+CACHE_TTL = 7 * 24 * 60 * 60  # seconds, geoIP data does change over time
 
 
 def parse_ip(ip_string: str) -> Tuple[str, str]:
@@ -17,61 +41,125 @@ def parse_ip(ip_string: str) -> Tuple[str, str]:
     original_ip = ip_string.strip()
     
     # Extract IP without port for API query
-    clean_ip = re.sub(r':\d+$', '', original_ip)
+    host, sep, port = original_ip.rpartition(':')
+    clean_ip = host if sep and port.isdecimal() else original_ip
     
     return clean_ip, original_ip
 
 
-def chunk_list(items: List[Any], chunk_size: int) -> List[List[Any]]:
-    """Split list into chunks of specified size."""
-    return [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+def chunk_list(items: List[Any], chunk_size: int) -> Iterator[List[Any]]:
+    """Lazily split list into chunks of specified size."""
+    for i in range(0, len(items), chunk_size):
+        yield items[i:i + chunk_size]
 
 
-def get_country_codes(ip_data: List[Tuple[str, str]], batch_size: int = 100) -> List[Dict[str, str]]:
+async def fetch_batch(session: aiohttp.ClientSession, limiter: AsyncLimiter, base_url: str,
+                      batch: List[str], batch_number: int, total_batches: int,
+                      ip_mapping: Dict[str, str]) -> List[Tuple[str, Dict[str, str]]]:
+    """
+    Look up a single batch of IPs, returning an empty list on failure.
+    Each result is paired with the IP sent in its position, since the API's 'query' may differ from it.
+    """
+    async with limiter:
+        try:
+            print(f"Processing batch {batch_number}/{total_batches} ({len(batch)} IPs)...")
+            async with session.post(base_url, json=batch) as response:
+                if response.status == 200:
+                    batch_results = json_loads(await response.read())
+                    
+                    # Replace clean IPs with original format in results
+                    paired = list(zip(batch, batch_results))
+                    for clean_ip, item in paired:
+                        original_ip = ip_mapping.get(clean_ip, clean_ip)  # Unmapped IPs were already in original form
+                        item['original'] = original_ip
+                    
+                    return paired
+                
+                print(f"Error in batch {batch_number}: HTTP {response.status}", file=sys.stderr)
+                print(await response.text(), file=sys.stderr)
+        
+        except Exception as e:
+            print(f"Error processing batch {batch_number}: {str(e)}", file=sys.stderr)
+    
+    return []
+
+
+async def query_ip_api(clean_ips: List[str], batch_size: int,
+                       ip_mapping: Dict[str, str]) -> List[Tuple[str, Dict[str, str]]]:
+    """Send clean IPs to the IP-API batch endpoint and return (sent IP, result) pairs."""
+    if not clean_ips:
+        return []
+    
+    base_url = "http://ip-api.com/batch?fields=countryCode,query"
+    
+    # Split IPs into batches
+    total_batches = -(-len(clean_ips) // batch_size)
+    
+    # Workers share one lazy batch generator, so only in-flight batches are sliced at any time
+    batches = enumerate(chunk_list(clean_ips, batch_size), start=1)
+    batch_results = {}
+    
+    limiter = AsyncLimiter(RATE_LIMIT, RATE_PERIOD)
+    connector = aiohttp.TCPConnector(limit=16)
+    timeout = aiohttp.ClientTimeout(total=TIMEOUT)
+    
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        async def worker():
+            for batch_number, batch in batches:
+                batch_results[batch_number] = await fetch_batch(
+                    session, limiter, base_url, batch, batch_number, total_batches, ip_mapping
+                )
+        
+        await asyncio.gather(*(worker() for _ in range(min(MAX_CONCURRENT_REQUESTS, total_batches))))
+    
+    # Flatten in batch order to keep input order
+    return [item for batch_number in sorted(batch_results) for item in batch_results[batch_number]]
+
+
+async def get_country_codes(ip_data: List[Tuple[str, str]], batch_size: int = 100,
+                            cache_file: Optional[str] = CACHE_FILE) -> List[Dict[str, str]]:
     """
     Query the IP-API batch endpoint to get country codes for IPs.
     Handles batching requests to respect the 100 entry limit.
+    Batches are sent concurrently, throttled to the API rate limit.
+    IPs with a fresh entry in cache_file are not queried; pass None to disable the cache.
     Preserves original IP format in the results.
     """
-    base_url = "http://ip-api.com/batch?fields=countryCode,query"
-    results = []
-    
     # Extract clean IPs for API requests
     clean_ips = [item[0] for item in ip_data]
     
-    # Create a mapping of clean IPs to original IPs
-    ip_mapping = {item[0]: item[1] for item in ip_data}
-    
-    # Split IPs into batches
-    batches = chunk_list(clean_ips, batch_size)
+    # Map clean IPs back to their original form; only entries that had a port differ
+    ip_mapping = {clean_ip: original_ip for clean_ip, original_ip in ip_data if clean_ip != original_ip}
     
-    for i, batch in enumerate(batches):
-        try:
-            print(f"Processing batch {i+1}/{len(batches)} ({len(batch)} IPs)...")
-            response = requests.post(base_url, json=batch)
-            
-            if response.status_code == 200:
-                batch_results = response.json()
-                
-                # Replace clean IPs with original format in results
-                for item in batch_results:
-                    clean_ip = item['query']
-                    original_ip = ip_mapping.get(clean_ip, clean_ip)  # Fallback to clean IP if not found
-                    item['original'] = original_ip
-                
-                results.extend(batch_results)
-            else:
-                print(f"Error in batch {i+1}: HTTP {response.status_code}", file=sys.stderr)
-                print(response.text, file=sys.stderr)
-            
-            # Add a short delay between batches to be nice to the API
-            if i < len(batches) - 1:
-                time.sleep(0.5)
-                
-        except Exception as e:
-            print(f"Error processing batch {i+1}: {str(e)}", file=sys.stderr)
+    # Results by clean IP, starting with whatever is still fresh in the cache
+    found = {}
+    cache = shelve.open(cache_file) if cache_file else {}
+    try:
+        now = time.time()
+        for clean_ip in clean_ips:
+            entry = cache.get(clean_ip)
+            if entry and now - entry['time'] < CACHE_TTL:
+                found[clean_ip] = {
+                    'countryCode': entry['countryCode'],
+                    'query': clean_ip,
+                    'original': ip_mapping.get(clean_ip, clean_ip)
+                }
+        
+        # Only query each uncached IP once
+        missing = [clean_ip for clean_ip in dict.fromkeys(clean_ips) if clean_ip not in found]
+        if found:
+            print(f"Found {len(found)} IPs in cache, querying {len(missing)}")
+        
+        for clean_ip, item in await query_ip_api(missing, batch_size, ip_mapping):
+            found[clean_ip] = item
+            if 'countryCode' in item:
+                cache[clean_ip] = {'countryCode': item['countryCode'], 'time': now}
+    finally:
+        if cache_file:
+            cache.close()
     
-    return results
+    # Keep input order; IPs whose batch failed are left out
+    return [found[clean_ip] for clean_ip in clean_ips if clean_ip in found]
 
 
 def main():
@@ -85,6 +173,8 @@ def main():
                         help="Number of IPs per batch request (max 100)")
     parser.add_argument("-f", "--format", choices=["csv", "json", "txt"], default="txt",
                         help="Output format (default: txt)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help=f"Query every IP instead of using the on-disk cache ({CACHE_FILE})")
     
     args = parser.parse_args()
     
@@ -102,20 +192,23 @@ def main():
     
     # Get country codes
     batch_size = min(100, args.batch_size)  # Ensure we don't exceed API limit
-    results = get_country_codes(ip_data, batch_size)
+    cache_file = None if args.no_cache else CACHE_FILE
+    results = asyncio.run(get_country_codes(ip_data, batch_size, cache_file))
     
     # Write results to output file
     try:
-        with open(args.output, 'w') as f:
-            if args.format == "json":
-                json.dump(results, f, indent=2)
-            elif args.format == "csv":
-                f.write("ip,countryCode\n")
-                for item in results:
-                    f.write(f"{item['original']},{item.get('countryCode', 'UNKNOWN')}\n")
-            else:  # txt format
-                for item in results:
-                    f.write(f"{item['original']} {item.get('countryCode', 'UNKNOWN')}\n")
+        if args.format == "json":
+            with open(args.output, 'wb') as f:
+                f.write(json_dumps(results, indent=True))
+        else:
+            with open(args.output, 'w') as f:
+                if args.format == "csv":
+                    f.write("ip,countryCode\n")
+                    for item in results:
+                        f.write(f"{item['original']},{item.get('countryCode', 'UNKNOWN')}\n")
+                else:  # txt format
+                    for item in results:
+                        f.write(f"{item['original']} {item.get('countryCode', 'UNKNOWN')}\n")
         
         print(f"Results written to {args.output} in {args.format} format")
     
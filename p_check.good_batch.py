@@ -1,15 +1,37 @@
 import requests
 import json
-from typing import List, Dict
+from typing import List, Dict, Iterable, Iterator
 import time
 import os
 import argparse
 import csv
+import itertools
+from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException
 
-def chunk_list(lst: List[str], chunk_size: int) -> List[List[str]]:
-    """Split a list into chunks of specified size."""
-    return [lst[i:i + chunk_size] for i in range(0, len(lst), chunk_size)]
+try:
+    import orjson
+    json_loads = orjson.loads
+
+    def json_dumps(obj, indent: bool = False) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+except ImportError:
+    json_loads = json.loads
+
+    def json_dumps(obj, indent: bool = False) -> bytes:
+        return json.dumps(obj, indent=2 if indent else None).encode()
+
+# Results are appended to an NDJSON log; the state file records the last completed batch
+PROGRESS_FILE = 'progress.ndjson'
+PROGRESS_STATE_FILE = 'progress.state'
+
+# Minimum time between the starts of consecutive batch requests
+BATCH_INTERVAL = 5  # seconds
+
+def chunk_list(lst: List[str], chunk_size: int) -> Iterator[List[str]]:
+    """Lazily split a list into chunks of specified size."""
+    for i in range(0, len(lst), chunk_size):
+        yield lst[i:i + chunk_size]
 
 def prepare_request_data(proxies: List[str]) -> Dict[str, List[str]]:
     """Prepare the request data in the format expected by the API."""
@@ -24,7 +46,7 @@ def check_proxies(proxies: List[str], api_url: str, session: requests.Session, m
         try:
             response = session.post(api_url, data=data, timeout=30)
             response.raise_for_status()
-            return json.loads(response.text)
+            return json_loads(response.content)
         except RequestException as e:
             print(f"Error on attempt {attempt + 1}/{max_retries}: {str(e)}")
             if attempt < max_retries - 1:
@@ -34,30 +56,39 @@ def check_proxies(proxies: List[str], api_url: str, session: requests.Session, m
                 print("Max retries reached. Moving to next batch.")
                 return []
 
-def process_proxy_list(proxy_list: List[str], batch_size: int = 1000, api_url: str = "https://api.proxyscrape.com/v2/online_check.php", session: requests.Session = None, resume_from: int = 0) -> List[Dict]:
-    """Process the entire list of proxies in batches."""
-    all_results = []
-    batches = chunk_list(proxy_list, batch_size)
+def process_proxy_list(proxy_list: List[str], batch_size: int = 1000, api_url: str = "https://api.proxyscrape.com/v2/online_check.php", session: requests.Session = None, resume_from: int = 0) -> int:
+    """Process the entire list of proxies in batches, appending results to the progress log."""
+    checked = 0
+    total_batches = -(-len(proxy_list) // batch_size)
+    batches = itertools.islice(chunk_list(proxy_list, batch_size), resume_from, None)
     
     if session is None:
-        session = requests.Session()
+        session = create_session_with_proxy()
     
-    for i, batch in enumerate(batches[resume_from:], start=resume_from):
-        print(f"Processing batch {i+1}/{len(batches)}...")
+    next_request = 0.0
+    for i, batch in enumerate(batches, start=resume_from):
+        # Avoid overwhelming the API, but only wait out what is left of the interval
+        delay = next_request - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        next_request = time.monotonic() + BATCH_INTERVAL
+        
+        print(f"Processing batch {i+1}/{total_batches}...")
         results = check_proxies(batch, api_url, session)
-        all_results.extend(results)
+        checked += len(results)
         
         # Save progress after each batch
-        save_progress(i + 1, all_results)
-        
-        # Add a delay to avoid overwhelming the API
-        time.sleep(5)
+        save_progress(i + 1, results)
     
-    return all_results
+    return checked
 
 def create_session_with_proxy(proxy: str = None) -> requests.Session:
     """Create a requests Session with the specified proxy."""
     session = requests.Session()
+    # check_proxies does its own retrying; the adapter only keeps connections alive between batches
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
     if proxy:
         session.proxies = {
             'http': proxy,
@@ -70,36 +101,60 @@ def load_proxies_from_file(filename: str) -> List[str]:
     with open(filename, 'r') as f:
         return [line.strip() for line in f if line.strip()]
 
-def save_results_to_file(results: List[Dict], filename: str, output_format: str, only_working: bool = False):
+def save_results_to_file(results: Iterable[Dict], filename: str, output_format: str, only_working: bool = False):
     """Save the results to a file in the specified format."""
     if only_working:
-        results = [r for r in results if r.get('working', False)]
+        results = (r for r in results if r.get('working', False))
 
     if output_format == 'json':
-        with open(filename, 'w') as f:
-            json.dump(results, f, indent=2)
+        with open(filename, 'wb') as f:
+            f.write(json_dumps(list(results), indent=True))
     elif output_format == 'txt':
         with open(filename, 'w') as f:
             for result in results:
                 f.write(f"{result['ip']}:{result['port']}\n")
     elif output_format == 'csv':
+        results = iter(results)
+        first = next(results, None)
+        keys = tuple(first.keys()) if first else ()
         with open(filename, 'w', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=results[0].keys() if results else [])
-            writer.writeheader()
-            writer.writerows(results)
+            writer = csv.writer(f, quoting=csv.QUOTE_MINIMAL)
+            writer.writerow(keys)
+            if first:
+                writer.writerows([r.get(k, "") for k in keys] for r in itertools.chain([first], results))
 
 def save_progress(batch_number: int, results: List[Dict]):
-    """Save the current progress to a file."""
-    with open('progress.json', 'w') as f:
-        json.dump({'batch': batch_number, 'results': results}, f)
-
-def load_progress() -> (int, List[Dict]):
-    """Load the progress from a file if it exists."""
-    if os.path.exists('progress.json'):
-        with open('progress.json', 'r') as f:
-            data = json.load(f)
-        return data['batch'], data['results']
-    return 0, []
+    """Append a batch's results to the progress log and record the batch as done."""
+    with open(PROGRESS_FILE, 'ab') as f:
+        f.write(b''.join(json_dumps(result) + b'\n' for result in results))
+        offset = f.tell()
+    with open(PROGRESS_STATE_FILE, 'wb') as f:
+        f.write(json_dumps({'batch': batch_number, 'offset': offset}))
+
+def load_progress() -> int:
+    """Return the last completed batch number, or 0 if there is no saved progress."""
+    if not os.path.exists(PROGRESS_STATE_FILE):
+        clear_progress()
+        return 0
+    with open(PROGRESS_STATE_FILE, 'rb') as f:
+        state = json_loads(f.read())
+    # Drop rows from a batch that was interrupted before its state was recorded
+    os.truncate(PROGRESS_FILE, state['offset'])
+    return state['batch']
+
+def iter_progress() -> Iterator[Dict]:
+    """Stream saved results back out of the progress log."""
+    if not os.path.exists(PROGRESS_FILE):
+        return
+    with open(PROGRESS_FILE, 'rb') as f:
+        for line in f:
+            yield json_loads(line)
+
+def clear_progress():
+    """Remove the progress log and its state file."""
+    for path in (PROGRESS_FILE, PROGRESS_STATE_FILE):
+        if os.path.exists(path):
+            os.remove(path)
 
 def main():
     parser = argparse.ArgumentParser(description="Proxy Checker Script")
@@ -116,20 +171,22 @@ def main():
 
     session = create_session_with_proxy(args.proxy)
 
-    resume_from, previous_results = load_progress() if args.resume else (0, [])
     if args.resume:
+        resume_from = load_progress()
         print(f"Resuming from batch {resume_from}")
+    else:
+        # Start a fresh log rather than appending to a previous run's
+        clear_progress()
+        resume_from = 0
 
-    results = process_proxy_list(proxy_list, session=session, resume_from=resume_from)
-    results = previous_results + results
+    process_proxy_list(proxy_list, session=session, resume_from=resume_from)
 
     output_file = f"{args.output}.{args.format}"
-    save_results_to_file(results, output_file, args.format, args.only_working)
+    save_results_to_file(iter_progress(), output_file, args.format, args.only_working)
     print(f"Results saved to {output_file}")
 
-    # Clean up progress file
-    if os.path.exists('progress.json'):
-        os.remove('progress.json')
+    # Clean up progress files
+    clear_progress()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
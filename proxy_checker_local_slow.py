@@ -3,52 +3,79 @@ import argparse
 import asyncio
 import aiohttp
 import aiofiles
-import re
+import json
 import time
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 from concurrent.futures import ThreadPoolExecutor
 
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+try:
+    from aiohttp_socks import ProxyConnector
+except ImportError:  # reported from __main__ so the module stays importable
+    ProxyConnector = None
+
 API_URL = "http://ip-api.com/json"
 TIMEOUT = 10  # seconds
 
-# Regular expression to match proxy with protocol
-PROXY_REGEX = re.compile(r"^(?:(?P<protocol>http|https|socks4|socks5):\/\/)?(?P<ip>[^:]+):(?P<port>\d+)$")
+# Protocols accepted as a "protocol://" prefix on proxy lines
+PROXY_PROTOCOLS = ('http', 'https', 'socks4', 'socks5')
 
-async def check_proxy(proxy: str, protocol: str) -> Tuple[bool, Dict]:
+def parse_proxy_line(line: str) -> Optional[Tuple[Optional[str], str, str]]:
+    """
+    Split a proxy line of the form [protocol://]ip:port into its parts using plain string methods.
+    The ip may not contain ':' and the port must be all digits.
+    
+    Returns:
+        Tuple of (protocol or None, ip, port), or None if the line is not a valid proxy
+    """
+    protocol = None
+    rest = line
+    sep = line.find('://')
+    if sep != -1:
+        protocol = line[:sep]
+        rest = line[sep + 3:]
+    
+    if protocol is not None and protocol not in PROXY_PROTOCOLS:
+        return None
+    
+    ip, colon, port = rest.rpartition(':')
+    if not ip or ':' in ip or not port.isdecimal():
+        return None
+    return protocol, ip, port
+
+async def check_proxy(proxy: str, protocol: str, session: aiohttp.ClientSession) -> Tuple[bool, Dict]:
     """
     Check if a proxy works with the specified protocol
     
     Args:
         proxy: The proxy in format IP:PORT
         protocol: The protocol to use (http, https, socks4, socks5)
+        session: Shared session used for HTTP proxies (SOCKS proxies need their own connector)
     
     Returns:
         Tuple of (success, result_dict)
     """
     formatted_proxy = f"{protocol}://{proxy}"
-    proxies = {
-        "http": formatted_proxy,
-        "https": formatted_proxy
-    }
     
     try:
         connector = None
         if protocol in ('socks4', 'socks5'):
-            import aiohttp_socks
-            if protocol == 'socks4':
-                connector = aiohttp_socks.ProxyConnector.from_url(formatted_proxy, rdns=True)
-            else:  # socks5
-                connector = aiohttp_socks.ProxyConnector.from_url(formatted_proxy)
-        
-        timeout = aiohttp.ClientTimeout(total=TIMEOUT)
+            # socks4 resolves hostnames on the proxy; socks5 keeps the library default
+            connector = ProxyConnector.from_url(formatted_proxy, rdns=True if protocol == 'socks4' else None)
         
         if connector:
-            async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            timeout = aiohttp.ClientTimeout(total=TIMEOUT)
+            async with aiohttp.ClientSession(connector=connector, timeout=timeout) as socks_session:
                 start_time = time.time()
-                async with session.get(API_URL) as response:
+                async with socks_session.get(API_URL) as response:
                     response_time = time.time() - start_time
                     if response.status == 200:
-                        data = await response.json()
+                        data = json_loads(await response.read())
                         return True, {
                             "proxy": proxy,
                             "protocol": protocol,
@@ -58,20 +85,19 @@ async def check_proxy(proxy: str, protocol: str) -> Tuple[bool, Dict]:
                             "status": "Working"
                         }
         else:
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                start_time = time.time()
-                async with session.get(API_URL, proxy=proxies.get('http')) as response:
-                    response_time = time.time() - start_time
-                    if response.status == 200:
-                        data = await response.json()
-                        return True, {
-                            "proxy": proxy,
-                            "protocol": protocol,
-                            "ip": data.get("query", ""),
-                            "country": data.get("country", ""),
-                            "ping": round(response_time * 1000),  # ms
-                            "status": "Working"
-                        }
+            start_time = time.time()
+            async with session.get(API_URL, proxy=formatted_proxy) as response:
+                response_time = time.time() - start_time
+                if response.status == 200:
+                    data = json_loads(await response.read())
+                    return True, {
+                        "proxy": proxy,
+                        "protocol": protocol,
+                        "ip": data.get("query", ""),
+                        "country": data.get("country", ""),
+                        "ping": round(response_time * 1000),  # ms
+                        "status": "Working"
+                    }
     except Exception as e:
         pass
     
@@ -81,17 +107,16 @@ async def check_proxy(proxy: str, protocol: str) -> Tuple[bool, Dict]:
         "status": "Failed"
     }
 
-async def process_proxy(proxy_line: str, protocols: List[str]) -> List[Dict]:
+async def process_proxy(proxy_line: str, protocols: List[str], session: aiohttp.ClientSession) -> List[Dict]:
     """Process a single proxy line with multiple protocols if needed"""
     results = []
-    match = PROXY_REGEX.match(proxy_line.strip())
+    parsed = parse_proxy_line(proxy_line.strip())
     
-    if not match:
+    if not parsed:
         return results
     
-    proxy_data = match.groupdict()
-    ip_port = f"{proxy_data['ip']}:{proxy_data['port']}"
-    original_protocol = proxy_data.get('protocol')
+    original_protocol, ip, port = parsed
+    ip_port = f"{ip}:{port}"
     
     # Determine which protocols to test
     protocols_to_test = []
@@ -105,25 +130,37 @@ async def process_proxy(proxy_line: str, protocols: List[str]) -> List[Dict]:
         protocols_to_test = ['http', 'socks4', 'socks5']
     
     for protocol in protocols_to_test:
-        success, result = await check_proxy(ip_port, protocol)
+        success, result = await check_proxy(ip_port, protocol, session)
         if success:
             results.append(result)
     
     return results
 
-async def process_proxy_batch(batch: List[str], protocols: List[str]) -> List[Dict]:
-    """Process a batch of proxies concurrently"""
-    tasks = [process_proxy(proxy_line, protocols) for proxy_line in batch]
-    results = await asyncio.gather(*tasks)
-    # Flatten list of lists
-    return [item for sublist in results for item in sublist]
+async def proxy_worker(queue: asyncio.Queue, results_queue: asyncio.Queue, protocols: List[str],
+                       session: aiohttp.ClientSession):
+    """Pull proxy lines off the queue until cancelled, pushing each line's results to results_queue"""
+    while True:
+        proxy_line = await queue.get()
+        results = []
+        try:
+            results = await process_proxy(proxy_line, protocols, session)
+        except Exception as e:
+            print(f"Error checking {proxy_line}: {e}")
+        finally:
+            # Always report back, main expects exactly one entry per proxy line
+            results_queue.put_nowait(results)
+            queue.task_done()
 
 async def save_results(results: List[Dict], output_file: str):
     """Save results to the specified output file"""
+    # Build the whole file up front so it goes out in a single write
+    buf = "".join(
+        f"{result['protocol']}://{result['proxy']} - Country: {result.get('country', 'Unknown')}, Ping: {result.get('ping', 'N/A')}ms\n"
+        for result in results
+        if result.get('status') == 'Working'
+    )
     async with aiofiles.open(output_file, 'w') as f:
-        for result in results:
-            if result.get('status') == 'Working':
-                await f.write(f"{result['protocol']}://{result['proxy']} - Country: {result.get('country', 'Unknown')}, Ping: {result.get('ping', 'N/A')}ms\n")
+        await f.write(buf)
 
 def validate_protocols(protocols: List[str]) -> List[str]:
     """Validate and normalize protocol arguments"""
@@ -141,7 +178,7 @@ async def main():
     parser = argparse.ArgumentParser(description='Proxy Checker Tool')
     parser.add_argument('input_file', help='File containing proxies to check')
     parser.add_argument('-o', '--output', default='results.txt', help='Output file for working proxies')
-    parser.add_argument('-t', '--threads', type=int, default=10, help='Number of threads to use')
+    parser.add_argument('-t', '--threads', type=int, default=100, help='Number of proxies to check concurrently (default: 100)')
     parser.add_argument('-all', action='store_true', help='Test all proxy types per IP')
     parser.add_argument('-http', action='store_true', help='Test HTTP proxies')
     parser.add_argument('-socks4', action='store_true', help='Test SOCKS4 proxies')
@@ -174,26 +211,47 @@ async def main():
     
     print(f"Loaded {len(proxies)} proxies from {args.input_file}")
     print(f"Testing protocols: {', '.join(protocols) if protocols else 'Based on proxy format or all'}")
-    print(f"Using {args.threads} threads")
+    print(f"Checking {args.threads} proxies at a time")
+    
+    # Queue every proxy up front; a fixed pool of workers keeps args.threads checks in flight
+    queue = asyncio.Queue()
+    for proxy_line in proxies:
+        queue.put_nowait(proxy_line)
+    results_queue = asyncio.Queue()
     
-    # Process proxies in batches
     all_results = []
-    batch_size = max(1, len(proxies) // args.threads)
+    working = 0
+    report_every = max(1, len(proxies) // args.threads)
     
-    for i in range(0, len(proxies), batch_size):
-        batch = proxies[i:i+batch_size]
-        results = await process_proxy_batch(batch, protocols)
-        all_results.extend(results)
+    # One session for all HTTP proxies so connections and DNS lookups are reused.
+    # Each worker holds at most one HTTP connection, so a limit of args.threads never
+    # leaves a check waiting for a connection (which would count against its timeout).
+    timeout = aiohttp.ClientTimeout(total=TIMEOUT)
+    connector = aiohttp.TCPConnector(limit=args.threads, ttl_dns_cache=300)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        workers = [
+            asyncio.create_task(proxy_worker(queue, results_queue, protocols, session))
+            for _ in range(args.threads)
+        ]
+        
+        for checked in range(1, len(proxies) + 1):
+            results = await results_queue.get()
+            all_results.extend(results)
+            working += sum(1 for r in results if r.get('status') == 'Working')
+            
+            # Print progress
+            if checked % report_every == 0 or checked == len(proxies):
+                print(f"Progress: {checked}/{len(proxies)} - Working: {working}")
         
-        # Print progress
-        working = sum(1 for r in all_results if r.get('status') == 'Working')
-        print(f"Progress: {min(i+batch_size, len(proxies))}/{len(proxies)} - Working: {working}")
+        await queue.join()
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
     
     # Save results to file
     await save_results(all_results, args.output)
     
     # Print summary
-    working = sum(1 for r in all_results if r.get('status') == 'Working')
     print(f"\nSummary:")
     print(f"Total proxies checked: {len(proxies)}")
     print(f"Working proxies: {working}")
@@ -210,9 +268,7 @@ async def main():
         print(f"Working {protocol.upper()} proxies: {count}")
 
 if __name__ == "__main__":
-    try:
-        import aiohttp_socks
-    except ImportError:
+    if ProxyConnector is None:
         print("aiohttp_socks package is required for SOCKS proxy support.")
         print("Please install it with: pip install aiohttp-socks")
         exit(1)